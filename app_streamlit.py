@@ -1,8 +1,11 @@
-import json
+import hashlib
+import io
+import diskcache
+import orjson
 import pandas as pd
 import pydeck as pdk
 import streamlit as st
-from flood_core import run_scan
+from flood_core import SCAN_CACHE_DIR, run_scan
 
 st.set_page_config(page_title="Global Flood Watch (Sentinel-1 + JRC)", layout="wide")
 st.title("🌊 Global Flood Watch — Sentinel-1 (RTC) + JRC Global Surface Water")
@@ -38,10 +41,42 @@ st.markdown(
 compares with JRC Global Surface Water occurrence, and flags cells with **new water**."""
 )
 
-@st.cache_data(show_spinner=False, ttl=3600)
+SCAN_TTL_S = 3600  # max age of a served result; the scan window is relative to "now"
+L1_TTL_S = 15 * 60
+
+@st.cache_resource
+def scan_disk_cache():
+    try:
+        return diskcache.Cache(SCAN_CACHE_DIR)
+    except Exception:
+        return None  # unwritable cache dir: run with the in-process L1 only
+
+# L1: in-process st.cache_data; L2: on-disk cache that survives app restarts.
+# An L2 hit is re-cached in L1 for up to L1_TTL_S, so L2 entries expire that much sooner
+# to keep the total age of any served result within SCAN_TTL_S.
+@st.cache_data(show_spinner=False, ttl=L1_TTL_S)
 def cached_scan(params_json: str):
-    params = json.loads(params_json)
-    df, gj = run_scan(**params)
+    cache = scan_disk_cache()
+    key = hashlib.sha256(params_json.encode("utf-8")).hexdigest()
+    hit = None
+    if cache is not None:
+        try:
+            hit = cache.get(key)
+        except Exception:
+            hit = None
+    if hit is not None:
+        df = pd.read_parquet(io.BytesIO(hit["df"])) if hit["df"] else pd.DataFrame()
+        return df.to_dict(orient="records"), orjson.loads(hit["gj"])
+    df, gj = run_scan(**orjson.loads(params_json))
+    if cache is not None:
+        buf = io.BytesIO()
+        if not df.empty:
+            df.to_parquet(buf)
+        try:
+            cache.set(key, {"df": buf.getvalue(), "gj": orjson.dumps(gj, option=orjson.OPT_SERIALIZE_NUMPY)},
+                      expire=SCAN_TTL_S - L1_TTL_S)
+        except Exception:
+            pass
     return df.to_dict(orient="records"), gj
 
 if run_btn:
@@ -52,7 +87,7 @@ if run_btn:
         max_items_per_cell=max_items_per_cell, max_cells=max_cells
     )
     with st.spinner("Scanning…"):
-        rows, gj = cached_scan(json.dumps(params, sort_keys=True))
+        rows, gj = cached_scan(orjson.dumps(params, option=orjson.OPT_SORT_KEYS).decode())
     df = pd.DataFrame(rows)
 
     if df.empty:
@@ -91,8 +126,7 @@ if run_btn:
         st.subheader("Download")
         st.download_button("Download CSV", data=df.to_csv(index=False).encode("utf-8"),
                            file_name="alerts.csv", mime="text/csv")
-        import json as _json
-        st.download_button("Download GeoJSON", data=_json.dumps(gj).encode("utf-8"),
+        st.download_button("Download GeoJSON", data=orjson.dumps(gj, option=orjson.OPT_SERIALIZE_NUMPY),
                            file_name="alerts.geojson", mime="application/geo+json")
 else:
     st.info("Adjust parameters in the sidebar and click **Run Scan**.")
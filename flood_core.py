@@ -1,13 +1,20 @@
-import json, datetime as dt
-from typing import Dict, List, Optional, Tuple
+import functools, json, os, threading, datetime as dt
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
 
+import dask.bag as dbag
+import diskcache
+import numba
 import numpy as np
 import pandas as pd
 import xarray as xr
-import geopandas as gpd
+import shapely
 import shapely.geometry as sgeom
+from shapely.strtree import STRtree
 import rioxarray  # noqa
+import rasterio
 from rasterio.enums import Resampling
+from rasterio.vrt import WarpedVRT
 from pystac_client import Client
 import planetary_computer
 import stackstac
@@ -15,32 +22,126 @@ import stackstac
 PLANETARY_COMPUTER_STAC = "https://planetarycomputer.microsoft.com/api/stac/v1"
 S1_COLLECTION = "sentinel-1-rtc"
 JRC_COLLECTION = "jrc-gsw"
-EQUAL_AREA_CRS = "EPSG:6933"
+M_PER_DEG = 111320.0
+JRC_TILE_DEG = 10
+# One base for all on-disk caches, each in its own sibling directory.
+CACHE_DIR = os.environ.get("FLOODWATCH_CACHE_DIR",
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), ".flood_cache"))
+SCAN_CACHE_DIR = os.path.join(CACHE_DIR, "scans")
+TOKEN_CACHE_DIR = os.path.join(CACHE_DIR, "pc_tokens")
+TOKEN_EXPIRY_MARGIN_S = 5 * 60
+LAND_GEOJSON = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "ne_110m_land.geojson")
+LAND_BUFFER_DEG = 0.25  # 1:110m coastlines are generalized by tens of km; don't drop coastal cells
+# Same cloud-COG settings stackstac applies to its own reads; without them GDAL probes for sidecar files.
+JRC_GDAL_ENV = dict(GDAL_DISABLE_READDIR_ON_OPEN="EMPTY_DIR", GDAL_HTTP_MERGE_CONSECUTIVE_RANGES="YES",
+                    GDAL_HTTP_MULTIRANGE="YES", VSI_CACHE="TRUE")
+
+_jrc_item_cache: Dict[Tuple[int, int], Optional[tuple]] = {}
+_jrc_cache_lock = threading.Lock()
+_worker_local = threading.local()
+_pc_get_token = planetary_computer.sas.get_token
+_pc_token_store: Optional[diskcache.Cache] = None
+_pc_token_mem: Dict[str, object] = {}
+_token_cache_installed = False
+_token_lock = threading.Lock()
 
 def date_range_str(days_back: int) -> str:
     end = dt.datetime.utcnow().replace(microsecond=0)
     start = end - dt.timedelta(days=days_back)
     return f"{start.isoformat()}/{end.isoformat()}"
 
+@functools.lru_cache(maxsize=64)
 def generate_grid(lon_min: float, lon_max: float, lat_min: float, lat_max: float,
-                  step_deg: float) -> List[sgeom.Polygon]:
-    polys = []
-    lon = lon_min
-    while lon < lon_max:
-        lat = lat_min
-        while lat < lat_max:
-            ll = (lon, lat)
-            ur = (min(lon + step_deg, lon_max), min(lat + step_deg, lat_max))
-            polys.append(sgeom.box(ll[0], ll[1], ur[0], ur[1]))
-            lat += step_deg
-        lon += step_deg
-    return polys
-
-def to_db(linear: xr.DataArray, eps: float = 1e-6) -> xr.DataArray:
-    return 10.0 * xr.apply_ufunc(np.log10, xr.where(linear > eps, linear, eps))
+                  step_deg: float) -> Tuple[sgeom.Polygon, ...]:
+    # Cached per (extent, step); the app only offers a few dozen combinations. Tuple so callers can't mutate it.
+    lons = np.arange(lon_min, lon_max, step_deg)
+    lats = np.arange(lat_min, lat_max, step_deg)
+    lo, la = (a.ravel() for a in np.meshgrid(lons, lats, indexing="ij"))
+    boxes = shapely.box(lo, la, np.minimum(lo + step_deg, lon_max), np.minimum(la + step_deg, lat_max))
+    return tuple(boxes.tolist())
+
+@functools.lru_cache(maxsize=1)
+def land_tree() -> STRtree:
+    """Natural Earth 1:110m land, buffered and indexed; loaded on first use."""
+    with open(LAND_GEOJSON) as f:
+        fc = json.load(f)
+    land = shapely.buffer(shapely.union_all([sgeom.shape(ft["geometry"]) for ft in fc["features"]]),
+                          LAND_BUFFER_DEG)
+    return STRtree(shapely.get_parts(land))
+
+def filter_land_cells(grid) -> tuple:
+    cells = np.empty(len(grid), dtype=object)
+    cells[:] = grid
+    hit = np.unique(land_tree().query(cells, predicate="intersects")[0])
+    return tuple(cells[hit])
+
+@functools.lru_cache(maxsize=64)
+def land_grid(lon_min: float, lon_max: float, lat_min: float, lat_max: float,
+              step_deg: float) -> Tuple[sgeom.Polygon, ...]:
+    """generate_grid restricted to cells touching land; cached on the same key."""
+    return filter_land_cells(generate_grid(lon_min, lon_max, lat_min, lat_max, step_deg))
+
+def box_geojson(bounds: Tuple[float, float, float, float]) -> dict:
+    xmin, ymin, xmax, ymax = bounds
+    return {"type": "Polygon",
+            "coordinates": [[[xmin, ymin], [xmax, ymin], [xmax, ymax], [xmin, ymax], [xmin, ymin]]]}
+
+def db_to_linear(db: float) -> float:
+    return 10.0 ** (db / 10.0)
+
+def _shared_get_token(account_name: str, container_name: str, **kwargs):
+    # SAS tokens are per storage container and live ~1 h; share them across worker processes on disk
+    # so each process doesn't hit the token endpoint for the same containers. Every href gets signed,
+    # so check an in-process dict first and only touch SQLite when this process hasn't seen the container.
+    key = f"{account_name}/{container_name}"
+    token = _pc_token_mem.get(key)
+    if token is not None and token.ttl() > TOKEN_EXPIRY_MARGIN_S:
+        return token
+    store = _pc_token_store
+    token = None
+    if store is not None:
+        try:
+            token = store.get(key)
+        except Exception:
+            token = None
+    if token is None:
+        token = _pc_get_token(account_name, container_name, **kwargs)
+        ttl = token.ttl() - TOKEN_EXPIRY_MARGIN_S
+        if store is not None and ttl > 0:
+            try:
+                store.set(key, token, expire=ttl)
+            except Exception:
+                pass
+    _pc_token_mem[key] = token
+    return token
+
+def _install_token_cache() -> None:
+    global _pc_token_store, _token_cache_installed
+    if _token_cache_installed:
+        return
+    with _token_lock:
+        if _token_cache_installed:
+            return
+        try:
+            _pc_token_store = diskcache.Cache(TOKEN_CACHE_DIR)
+        except Exception:
+            # Unwritable cache dir (e.g. read-only container): tokens stay in the in-process dict only.
+            _pc_token_store = None
+        planetary_computer.sas.get_token = _shared_get_token
+        _token_cache_installed = True
 
 def open_pc_client() -> Client:
-    return Client.open(PLANETARY_COMPUTER_STAC, modifier=planetary_computer.sign_inplace)
+    """Unsigned STAC client. Items can outlive a SAS token (scan-wide S1 index, JRC tile cache),
+    so assets are signed right before they are read instead of at search time."""
+    _install_token_cache()
+    return Client.open(PLANETARY_COMPUTER_STAC)
+
+def worker_pc_client() -> Client:
+    """One client per worker thread/process, for tasks that can't share the driver's client."""
+    client = getattr(_worker_local, "client", None)
+    if client is None:
+        client = _worker_local.client = open_pc_client()
+    return client
 
 def search_s1_items(client: Client, geom_geojson: dict, dt_str: str, max_items: int = 40):
     return list(client.search(
@@ -51,87 +152,189 @@ def search_s1_items(client: Client, geom_geojson: dict, dt_str: str, max_items:
         max_items=max_items,
     ).get_items())
 
-def stack_s1(items, resolution=0.00012):
+def search_s1_index(client: Client, bbox: Tuple[float, float, float, float], dt_str: str,
+                    max_items: int) -> Tuple[list, STRtree]:
+    """One STAC search over the whole scan extent, indexed by footprint for per-cell lookup."""
+    items = list(client.search(
+        collections=[S1_COLLECTION],
+        bbox=list(bbox),
+        datetime=dt_str,
+        query={"s1:instrument_mode": {"eq": "IW"}},
+        max_items=max_items,
+    ).get_items())
+    return items, STRtree([sgeom.shape(it.geometry) for it in items])
+
+def s1_items_for_cell(s1_index: Tuple[list, STRtree], cell_geom: sgeom.base.BaseGeometry,
+                      max_items: int = 40) -> list:
+    items, tree = s1_index
+    idx = np.sort(tree.query(cell_geom, predicate="intersects"))[:max_items]
+    return [items[i] for i in idx]
+
+def stack_s1(items, resolution=0.00012, bounds_latlon=None):
     if not items: return None
     available = set(items[0].assets.keys())
     assets = [a for a in ("VV", "VH") if a in available]
     if not assets:
         assets = [k for k in available if k.upper() in ("VV", "VH", "HH", "HV")]
         if not assets: return None
+    # chunksize counts output (EPSG:4326) pixels, not source COG tiles: S1 RTC is 10 m UTM, so no
+    # output chunk size lines up with its 512px tiles. 2048 keeps a 2° cell at ~9x9 chunks per band/scene.
     return stackstac.stack(
         items, assets=assets, chunksize=2048, epsg=4326, resolution=resolution,
-        resampling=Resampling.bilinear,
+        bounds_latlon=bounds_latlon, resampling=Resampling.bilinear,
     )
 
-def fetch_jrc_occurrence(client: Client, geom_geojson: dict) -> Optional[xr.DataArray]:
+def _jrc_tile_keys(bounds: Tuple[float, float, float, float]) -> list:
+    """Keys of every 10° JRC tile a bbox touches (at most 4 for cells up to 10°)."""
+    xmin, ymin, xmax, ymax = bounds
+    xs = range(int(np.floor(xmin / JRC_TILE_DEG)), int(np.ceil(xmax / JRC_TILE_DEG)))
+    ys = range(int(np.floor(ymin / JRC_TILE_DEG)), int(np.ceil(ymax / JRC_TILE_DEG)))
+    return [(kx, ky) for kx in xs for ky in ys]
+
+def _find_jrc_occurrence_item(client: Client, tile_key: Tuple[int, int]):
+    # JRC GSW is static and tiled on a 10° grid, so one search per tile serves every cell in it.
+    # Only the item and asset key are cached; hrefs are (re)signed at read time, so entries never go stale.
+    with _jrc_cache_lock:
+        if tile_key in _jrc_item_cache:
+            return _jrc_item_cache[tile_key]
+    center = {"type": "Point", "coordinates": [(tile_key[0] + 0.5) * JRC_TILE_DEG,
+                                               (tile_key[1] + 0.5) * JRC_TILE_DEG]}
     items = list(client.search(
         collections=[JRC_COLLECTION],
-        intersects=geom_geojson,
+        intersects=center,
         max_items=50
     ).get_items())
-    if not items: return None
     chosen, asset_key = None, None
     for it in items:
         for k in it.assets.keys():
             if "occurrence" in k.lower():
                 chosen, asset_key = it, k; break
         if chosen: break
-    if not chosen: return None
-    da = stackstac.stack([chosen], assets=[asset_key], chunksize=2048, epsg=4326,
-                         resampling=Resampling.nearest)
-    if "time" in da.dims: da = da.isel(time=0)
-    if "band" in da.dims: da = da.isel(band=0)
-    da.name = "jrc_occurrence"
-    return da
+    found = (chosen, asset_key) if chosen else None
+    with _jrc_cache_lock:
+        _jrc_item_cache[tile_key] = found
+    return found
+
+def signed_href(href: str) -> str:
+    """Fresh SAS signature for an asset href, discarding any (possibly expired) one it already carries."""
+    return planetary_computer.sign(href.split("?", 1)[0])
+
+def read_jrc_occurrence(client: Client, bounds: Tuple[float, float, float, float],
+                        ref: xr.DataArray) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """JRC occurrence warped straight onto ``ref``'s lat/lon grid, mosaicked over every tile the
+    bbox touches -> (occurrence, covered). Nodata inside a tile reads as 0 (not permanent);
+    ``covered`` is False where no JRC tile exists, and those pixels must be left out of the sums."""
+    h, w = ref.sizes["y"], ref.sizes["x"]
+    occ = np.zeros((h, w), dtype=np.uint8)
+    covered = np.zeros((h, w), dtype=bool)
+    xs, ys = ref["x"].values, ref["y"].values
+    transform = ref.rio.transform()
+    for key in _jrc_tile_keys(bounds):
+        found = _find_jrc_occurrence_item(client, key)
+        if not found: continue
+        chosen, asset_key = found
+        # A WarpedVRT over the target grid pulls only the source blocks the cell needs, with no full-extent buffer.
+        with rasterio.Env(**JRC_GDAL_ENV), rasterio.open(signed_href(chosen.assets[asset_key].href)) as src, \
+                WarpedVRT(src, crs="EPSG:4326", transform=transform, width=w, height=h,
+                          resampling=Resampling.nearest) as vrt:
+            data = vrt.read(1, masked=True)
+        x0, y0 = key[0] * JRC_TILE_DEG, key[1] * JRC_TILE_DEG
+        footprint = ((ys >= y0) & (ys < y0 + JRC_TILE_DEG))[:, None] & ((xs >= x0) & (xs < x0 + JRC_TILE_DEG))[None, :]
+        # Restrict writes to this tile's footprint: a COG without a nodata tag would otherwise
+        # overwrite neighbouring tiles' occurrence with its 0 fill.
+        write = footprint & ~np.ma.getmaskarray(data)
+        occ[write] = data.data[write]
+        covered |= footprint
+    if not covered.any(): return None
+    return occ, covered
+
+def _majority_below(da: xr.DataArray, thr_lin: float) -> xr.DataArray:
+    # Equivalent to median(time) <= thr for odd counts, but a streaming O(T) reduction with no sort.
+    votes = (da <= thr_lin).sum(dim="time")
+    valid = da.notnull().sum(dim="time")
+    return 2 * votes > valid
 
 def s1_water_mask(s1_da: xr.DataArray, vv_thr_db=-18.0, vh_thr_db=-27.0) -> xr.DataArray:
-    med = s1_da.median(dim="time", skipna=True)
-    bands = list(med.band.values.astype(str))
-    vv = med.sel(band="VV") if "VV" in bands else None
-    vh = med.sel(band="VH") if "VH" in bands else None
-    vv_db = to_db(vv) if vv is not None else None
-    vh_db = to_db(vh) if vh is not None else None
-    if vv_db is not None and vh_db is not None:
-        water = (vv_db <= vv_thr_db) & (vh_db <= vh_thr_db)
-    elif vv_db is not None:
-        water = (vv_db <= vv_thr_db)
-    elif vh_db is not None:
-        water = (vh_db <= vh_thr_db)
+    bands = list(s1_da.band.values.astype(str))
+    vv = s1_da.sel(band="VV") if "VV" in bands else None
+    vh = s1_da.sel(band="VH") if "VH" in bands else None
+    # Compare in linear power against converted thresholds rather than taking log10 of every pixel.
+    # No-data (NaN) pixels compare False and count as dry; the old dB path clamped them to -60 dB (water).
+    vv_thr_lin, vh_thr_lin = db_to_linear(vv_thr_db), db_to_linear(vh_thr_db)
+    if vv is not None and vh is not None:
+        water = _majority_below(vv, vv_thr_lin) & _majority_below(vh, vh_thr_lin)
+    elif vv is not None:
+        water = _majority_below(vv, vv_thr_lin)
+    elif vh is not None:
+        water = _majority_below(vh, vh_thr_lin)
     else:
-        water = xr.zeros_like(med.isel(band=0), dtype=bool)
-    return water.fillna(False).rename("water_now")
+        water = xr.zeros_like(s1_da.isel(band=0, time=0), dtype=bool)
+    return water.rename("water_now")
 
-def reproject_match_equal_area(src: xr.DataArray, ref: xr.DataArray):
-    ref_eq = ref.rio.write_crs(4326, inplace=False).rio.reproject(EQUAL_AREA_CRS, resampling=Resampling.nearest)
-    src_eq = src.rio.write_crs(4326, inplace=False).rio.reproject_match(ref_eq, resampling=Resampling.nearest)
-    return src_eq, ref_eq
+def row_pixel_area_km2(da: xr.DataArray) -> np.ndarray:
+    """Per-row pixel area of a lat/lon grid, from the degree size scaled by cos(latitude)."""
+    res_x, res_y = da.rio.resolution()
+    lat = np.deg2rad(da["y"].values)
+    return (M_PER_DEG * abs(res_y)) * (M_PER_DEG * abs(res_x) * np.cos(lat)) / 1e6
 
-def pixel_area_km2(da_eq: xr.DataArray) -> float:
-    transform = da_eq.rio.transform()
-    px_area_m2 = abs(transform.a * transform.e)
-    return px_area_m2 / 1e6
+_POPCOUNT8 = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+
+def pack_mask(mask: np.ndarray) -> np.ndarray:
+    """Bit-pack a boolean (y, x) mask along x."""
+    return np.packbits(mask, axis=1)
+
+def masked_area_km2(packed: np.ndarray, row_km2: np.ndarray) -> float:
+    return float(_POPCOUNT8[packed].sum(axis=1) @ row_km2)
+
+# Serial on purpose: run_scan already runs cells on many threads, and numba's parallel runtime
+# aborts the process on concurrent entry under the workqueue threading layer.
+@numba.njit(cache=True)
+def _flood_reduce(water_packed, jrc, perm_occ_thresh, row_km2):
+    h, w = jrc.shape
+    new_rows, perm_rows, water_rows = np.zeros(h), np.zeros(h), np.zeros(h)
+    for i in range(h):
+        n = p = wet = 0
+        for j in range(w):
+            wb = (water_packed[i, j >> 3] >> (7 - (j & 7))) & 1
+            pb = 1 if jrc[i, j] >= perm_occ_thresh else 0
+            wet += wb
+            p += pb
+            n += wb & (1 - pb)
+        new_rows[i] = n * row_km2[i]
+        perm_rows[i] = p * row_km2[i]
+        water_rows[i] = wet * row_km2[i]
+    return new_rows.sum(), perm_rows.sum(), water_rows.sum()
+
+def flood_areas_km2(water_packed: np.ndarray, jrc: np.ndarray, perm_occ_thresh: float,
+                    row_km2: np.ndarray) -> Tuple[float, float, float]:
+    """One fused pass over co-registered rasters -> (new_km2, perm_km2, water_km2)."""
+    new, perm, water = _flood_reduce(np.ascontiguousarray(water_packed), np.ascontiguousarray(jrc),
+                                     float(perm_occ_thresh), np.asarray(row_km2, dtype=np.float64))
+    return float(new), float(perm), float(water)
 
 def analyze_cell(client: Client, cell_geom: sgeom.base.BaseGeometry, dt_str: str,
                  vv_thr_db: float, vh_thr_db: float, perm_occ_thresh: int, min_km2: float,
-                 s1_res_deg: float = 0.00012, max_items_per_cell: int = 40) -> Optional[Dict]:
-    geom_geojson = json.loads(gpd.GeoSeries([cell_geom], crs=4326).to_json())["features"][0]["geometry"]
-    s1_items = search_s1_items(client, geom_geojson, dt_str, max_items=max_items_per_cell)
+                 s1_res_deg: float = 0.00012, max_items_per_cell: int = 40,
+                 s1_items: Optional[list] = None) -> Optional[Dict]:
+    geom_geojson = box_geojson(cell_geom.bounds)
+    if s1_items is None:
+        s1_items = search_s1_items(client, geom_geojson, dt_str, max_items=max_items_per_cell)
     if not s1_items: return None
-    s1_stack = stack_s1(s1_items, resolution=s1_res_deg)
+    s1_items = [planetary_computer.sign(it) for it in s1_items]
+    s1_stack = stack_s1(s1_items, resolution=s1_res_deg, bounds_latlon=cell_geom.bounds)
     if s1_stack is None: return None
     water_now = s1_water_mask(s1_stack, vv_thr_db=vv_thr_db, vh_thr_db=vh_thr_db)
-    jrc_occ = fetch_jrc_occurrence(client, geom_geojson)
-    if jrc_occ is None: return None
-    water_eq, jrc_eq = reproject_match_equal_area(water_now, jrc_occ)
-    perm = (jrc_eq >= perm_occ_thresh).fillna(False)
-    new_water = (water_eq.astype(bool) & (~perm.astype(bool))).fillna(False)
-    def _sum(a: xr.DataArray) -> float:
-        if hasattr(a.data, "compute"): return float(a.sum().compute())
-        return float(a.sum().item())
-    px_km2 = pixel_area_km2(new_water)
-    new_km2 = _sum(new_water) * px_km2
-    perm_km2 = _sum(perm) * px_km2
-    water_km2 = _sum(water_eq) * px_km2
+    water = pack_mask(water_now.values)
+    row_km2 = row_pixel_area_km2(water_now)
+    # New water is a subset of current water, so a dry cell can't alert; skip the JRC fetch for it.
+    if masked_area_km2(water, row_km2) < min_km2: return None
+    # JRC (30 m) is coarser than the S1 mask, so resample it onto the S1 grid rather than both onto an equal-area one.
+    jrc = read_jrc_occurrence(client, cell_geom.bounds, water_now)
+    if jrc is None: return None
+    jrc_on_s1, covered = jrc
+    # Pixels outside every JRC tile can't be classed as new vs permanent, so drop them from all sums.
+    water &= pack_mask(covered)
+    new_km2, perm_km2, water_km2 = flood_areas_km2(water, jrc_on_s1, perm_occ_thresh, row_km2)
     if new_km2 < min_km2: return None
     intensity = 0.0 if water_km2 == 0 else max(0.0, min(1.0, new_km2 / max(water_km2, 1e-6)))
     lon_min, lat_min, lon_max, lat_max = cell_geom.bounds
@@ -147,25 +350,47 @@ def analyze_cell(client: Client, cell_geom: sgeom.base.BaseGeometry, dt_str: str
         "perm_occurrence_threshold": perm_occ_thresh,
     }
 
+def _analyze_cell_task(task: tuple) -> Optional[Dict]:
+    cell, s1_items, args = task
+    try:
+        return analyze_cell(worker_pc_client(), cell, *args, s1_items=s1_items)
+    except Exception:
+        return None
+
 def run_scan(lon_min=-180, lon_max=180, lat_min=-60, lat_max=80,
              grid_step=2.0, days=7,
              vv_thr=-18.0, vh_thr=-27.0, perm_occ=90, min_km2=15.0,
-             s1_res_deg=0.00012, max_items_per_cell=40, max_cells=None):
+             s1_res_deg=0.00012, max_items_per_cell=40, max_cells=None, max_workers=16,
+             dask_scheduler=None, npartitions=64, land_only=True):
+    """Scan the region for new water.
+
+    Cells that don't touch land are skipped unless ``land_only=False``.
+    Cells run on a local thread pool by default. Pass ``dask_scheduler`` (e.g. a
+    ``distributed.Client`` or ``"processes"``) to fan them out as a dask bag instead;
+    workers must be able to import ``flood_core``.
+    """
     client = open_pc_client()
     dt_str = date_range_str(days)
-    grid = generate_grid(lon_min, lon_max, lat_min, lat_max, grid_step)
+    # Open-ocean cells can't show new inland water; drop them before spending STAC/COG reads.
+    grid = (land_grid if land_only else generate_grid)(lon_min, lon_max, lat_min, lat_max, grid_step)
     if max_cells is not None and len(grid) > max_cells:
         grid = grid[:max_cells]
-    alerts, features = [], []
-    for cell in grid:
-        try:
-            res = analyze_cell(client, cell, dt_str, vv_thr, vh_thr, perm_occ,
-                               min_km2, s1_res_deg, max_items_per_cell)
-            if res:
-                alerts.append(res)
-                features.append({"type": "Feature", "geometry": sgeom.mapping(cell), "properties": res})
-        except Exception:
-            continue
+    if not grid:
+        return pd.DataFrame(), {"type": "FeatureCollection", "features": []}
+    s1_index = search_s1_index(client, tuple(shapely.total_bounds(grid)), dt_str,
+                               max_items=max_items_per_cell * len(grid))
+    args = (dt_str, vv_thr, vh_thr, perm_occ, min_km2, s1_res_deg, max_items_per_cell)
+    tasks = [(cell, s1_items_for_cell(s1_index, cell, max_items=max_items_per_cell), args) for cell in grid]
+    if dask_scheduler is not None:
+        bag = dbag.from_sequence(tasks, npartitions=min(npartitions, len(tasks)))
+        alerts = bag.map(_analyze_cell_task).filter(bool).compute(scheduler=dask_scheduler)
+    else:
+        # Cells are independent and dominated by STAC/COG round-trips, so overlap them on threads.
+        with ThreadPoolExecutor(max_workers=max_workers) as ex:
+            alerts = [res for res in ex.map(_analyze_cell_task, tasks) if res]
+    features = [{"type": "Feature", "properties": res,
+                 "geometry": box_geojson((res["lon_min"], res["lat_min"], res["lon_max"], res["lat_max"]))}
+                for res in alerts]
     df = pd.DataFrame(alerts).sort_values(["new_water_km2"], ascending=False) if alerts else pd.DataFrame()
     gj = {"type": "FeatureCollection", "features": features}
     return df, gj